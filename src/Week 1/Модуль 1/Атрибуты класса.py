@@ -12,13 +12,16 @@ class FirstClass(metaclass=TimestampMeta):
     pass
 
 
-time.sleep(2)
-
-
 class SecondClass(metaclass=TimestampMeta):
     pass
 
 
 if __name__ == "__main__":
+    time.sleep(2)
+
+    # Класс, созданный позже, получает более позднее время
+    LaterClass = TimestampMeta("LaterClass", (), {})
+
     print(FirstClass.created_at)
     print(SecondClass.created_at)
+    print(LaterClass.created_at)
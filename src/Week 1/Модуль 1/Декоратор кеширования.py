@@ -1,5 +1,4 @@
 import functools
-import unittest.mock
 from collections import OrderedDict
 
 
@@ -49,6 +48,8 @@ def multiply(a: int, b: int) -> int:
 
 
 if __name__ == "__main__":
+    import unittest.mock
+
     assert sum(1, 2) == 3
     assert sum(3, 4) == 7
 
@@ -1,49 +1,208 @@
+import inspect
+import threading
+import timeit
+import weakref
+from collections import OrderedDict
+
+# Синглтон через механизм импортов: модуль выполняется один раз,
+# все импортирующие получают один и тот же объект
+from singleton_module import singleton
+
+# Сколько вариантов записи аргументов мультитон помнит без разбора сигнатуры
+KEY_ALIASES_MAX = 1024
+_KWARGS = object()  # разделитель позиционных и именованных аргументов в ключе
+
+
 # Синглтон через метакласс
 class SingletonMeta(type):
-    _instances = {}
+    def __init__(cls, name, bases, attrs, **kwargs):
+        # После создания экземпляр доступен как MyClass.instance - это обычное
+        # чтение атрибута без вызова, для горячих участков кода. Имя занято
+        # метаклассом, свой атрибут instance в классе объявлять нельзя
+        if "instance" in attrs:
+            raise TypeError(f"{name}: атрибут instance зарезервирован SingletonMeta")
+        super().__init__(name, bases, attrs, **kwargs)
+        # Свои атрибуты у каждого класса, чтобы подклассы не видели экземпляр родителя
+        cls.instance = None
+        cls._instance_lock = threading.Lock()
+
+    def __call__(cls, *args, **kwargs):
+        # Быстрый путь: после создания экземпляра - одно чтение атрибута класса
+        instance = cls.instance
+        if instance is not None:
+            return instance
+
+        # Double-checked locking: блокировка своя у каждого класса
+        with cls._instance_lock:
+            if cls.instance is None:
+                cls.instance = super().__call__(*args, **kwargs)
+        return cls.instance
+
+
+# Мультитон: по экземпляру на каждый набор аргументов конструктора.
+# Аргументы нормализуются по сигнатуре __init__, так что Connection("localhost"),
+# Connection("localhost", 6379) и Connection(host="localhost") - один экземпляр.
+# Сигнатура разбирается только для нового варианта записи аргументов, дальше
+# он находится в _key_aliases по сырому ключу.
+# maxsize - LRU-вытеснение лишних экземпляров, weak=True - экземпляр живет,
+# пока на него есть ссылки снаружи (вместе с maxsize не используется).
+class MultitonMeta(type):
+    def __new__(mcs, name, bases, attrs, maxsize=None, weak=False):
+        if weak and maxsize is not None:
+            raise TypeError("MultitonMeta: weak=True и maxsize несовместимы")
+        return super().__new__(mcs, name, bases, attrs)
+
+    def __init__(cls, name, bases, attrs, maxsize=None, weak=False):
+        super().__init__(name, bases, attrs)
+        cls._signature = inspect.signature(cls.__init__)
+        if weak:
+            cls._instances = weakref.WeakValueDictionary()
+        elif maxsize is not None:
+            cls._instances = OrderedDict()
+        else:
+            cls._instances = {}
+        cls._key_aliases = {}  # сырой ключ вызова -> нормализованный
+        cls._maxsize = maxsize
+        cls._instance_lock = threading.Lock()
+
+    def _make_key(cls, args, kwargs) -> tuple:
+        bound = cls._signature.bind(None, *args, **kwargs)  # None вместо self
+        bound.apply_defaults()
+        key = []
+        for name, value in list(bound.arguments.items())[1:]:
+            if cls._signature.parameters[name].kind is inspect.Parameter.VAR_KEYWORD:
+                value = tuple(sorted(value.items()))
+            key.append(value)
+        return tuple(key)
 
     def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super().__call__(*args, **kwargs)
-        return cls._instances[cls]
+        raw_key = (*args, _KWARGS, *sorted(kwargs.items())) if kwargs else args
+        key = cls._key_aliases.get(raw_key)
+        if key is None:
+            key = cls._make_key(args, kwargs)
+            if len(cls._key_aliases) >= KEY_ALIASES_MAX:
+                cls._key_aliases.clear()
+            cls._key_aliases[raw_key] = key
+
+        instance = cls._instances.get(key)
+        if instance is not None:
+            if cls._maxsize is not None:
+                try:
+                    cls._instances.move_to_end(key)
+                except KeyError:
+                    pass  # экземпляр вытеснили параллельно, но он еще валиден
+            return instance
+
+        with cls._instance_lock:
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = super().__call__(*args, **kwargs)
+                if cls._maxsize is not None and len(cls._instances) >= cls._maxsize:
+                    cls._instances.popitem(last=False)
+                cls._instances[key] = instance
+        return instance
 
 
 class MyClass(metaclass=SingletonMeta):
     pass
 
 
-a = MyClass()
-b = MyClass()
-
-print(a is b)  # True
+class Connection(metaclass=MultitonMeta, maxsize=128):
+    def __init__(self, host: str, port: int = 6379):
+        self.host = host
+        self.port = port
 
 
 # Синглтон через __new__
 class MySingleton:
     _instances = {}
+    _lock = threading.Lock()
     _initialized = False
 
     def __new__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super().__new__(cls)
-        return cls._instances[cls]
+        instance = cls._instances.get(cls)
+        if instance is None:
+            with cls._lock:
+                instance = cls._instances.get(cls)
+                if instance is None:
+                    instance = cls._instances[cls] = super().__new__(cls)
+        return instance
 
     def __init__(self, *args, **kwargs):
-        if not self._initialized:
-            self._initialized = True
-        return
+        # __init__ вызывается при каждом MySingleton(), поэтому инициализируем
+        # только один раз; флаг проверяем повторно под блокировкой
+        if self._initialized:
+            return
+        with self._lock:
+            if not self._initialized:
+                self.created_by = threading.current_thread().name
+                self._initialized = True
 
 
-a = MySingleton()
-b = MySingleton()
+def check_thread_safety(cls, threads_count: int = 16) -> bool:
+    barrier = threading.Barrier(threads_count)
+    instances = []
 
-print(a is b)  # True
+    def worker():
+        barrier.wait()  # все потоки создают экземпляр одновременно
+        instances.append(cls())
 
+    threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
 
-# Синглтон через механизм импортов
-from singleton_module import singleton
+    return all(instance is instances[0] for instance in instances)
+
+
+def benchmark(number: int = 1_000_000) -> None:
+    # Стоимость получения уже созданного экземпляра в сравнении с чтением
+    # глобальной переменной модуля, нс на вызов (лучший из 5 прогонов)
+    cases = {
+        "module global": "singleton",
+        "SingletonMeta": "MyClass()",
+        "MyClass.instance": "MyClass.instance",
+        "MultitonMeta": "Connection('localhost')",
+        "MySingleton": "MySingleton()",
+    }
+    for name, stmt in cases.items():
+        best = min(timeit.repeat(stmt, globals=globals(), number=number))
+        print(f"{name:>16}: {best / number * 1e9:6.1f} ns")
+
+
+if __name__ == "__main__":
+    a = MyClass()
+    b = MyClass()
+
+    print(a is b)  # True
+
+    a = Connection("localhost")
+    b = Connection("localhost")
+    c = Connection("redis", port=6380)
+
+    d = Connection("localhost", 6379)
+    e = Connection(host="localhost")
+
+    print(a is b, a is c, a is d is e)  # True False True
+
+    a = MySingleton()
+    b = MySingleton()
+
+    print(a is b)  # True
+
+    import singleton_module
+
+    print(singleton is singleton_module.singleton)  # True
+
+    class SlowInit(metaclass=SingletonMeta):
+        def __init__(self):
+            threading.Event().wait(0.01)  # дорогая инициализация
+
+    class FreshSingleton(MySingleton):
+        pass  # еще ни разу не создавался
 
-a = singleton
-b = singleton
+    print(check_thread_safety(SlowInit))  # True
+    print(check_thread_safety(FreshSingleton))  # True
 
-print(a is b)  # True
+    benchmark()
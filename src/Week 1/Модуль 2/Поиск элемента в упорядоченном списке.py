@@ -16,17 +16,18 @@ def search_in_sorted_list(sorted_list: List[int], number: int) -> bool:
     return False
 
 
-sorted_list = [1, 2, 3, 45, 356, 569, 600, 705, 923]
+if __name__ == "__main__":
+    sorted_list = [1, 2, 3, 45, 356, 569, 600, 705, 923]
 
-print(search_in_sorted_list(sorted_list, 45))  # True
-print(search_in_sorted_list(sorted_list, 100))  # False
+    print(search_in_sorted_list(sorted_list, 45))  # True
+    print(search_in_sorted_list(sorted_list, 100))  # False
 
-print(search_in_sorted_list([], 10))  # False
-print(search_in_sorted_list(sorted_list, 1))  # True
-print(search_in_sorted_list(sorted_list, 923))  # True
-print(search_in_sorted_list(sorted_list, 0))  # False
-print(search_in_sorted_list(sorted_list, 1000))  # False
+    print(search_in_sorted_list([], 10))  # False
+    print(search_in_sorted_list(sorted_list, 1))  # True
+    print(search_in_sorted_list(sorted_list, 923))  # True
+    print(search_in_sorted_list(sorted_list, 0))  # False
+    print(search_in_sorted_list(sorted_list, 1000))  # False
 
-duplicates = [1, 2, 2, 2, 3, 4, 5]
-print(search_in_sorted_list(duplicates, 2))  # True
-print(search_in_sorted_list(duplicates, 6))  # False
+    duplicates = [1, 2, 2, 2, 3, 4, 5]
+    print(search_in_sorted_list(duplicates, 2))  # True
+    print(search_in_sorted_list(duplicates, 6))  # False
@@ -14,11 +14,6 @@ RETRY_DELAY = 1
 ERROR_TIMEOUT_OR_CONNECTION_FAILED = 421
 ERROR_UNEXPECTED = 430
 
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s [%(url)s attempt=%(attempt)d]: %(message)s",
-)
 logger = logging.getLogger(__name__)
 
 
@@ -132,4 +127,8 @@ async def fetch_urls(input_file: str, output_file: str, concurrency: int = 5) ->
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s [%(url)s attempt=%(attempt)d]: %(message)s",
+    )
     asyncio.run(fetch_urls("urls.txt", "./results_advanced.jsonl"))
@@ -0,0 +1,289 @@
+import asyncio
+import contextvars
+import dataclasses
+import os
+import queue
+import threading
+import time
+import weakref
+
+import redis
+import redis.asyncio
+import redis.asyncio.retry
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+
+RETRY_ATTEMPTS = 3
+
+# Поля конфигурации, которые можно переопределить переменными окружения
+ENV_VARS = {
+    "host": ("REDIS_HOST", str),
+    "port": ("REDIS_PORT", int),
+    "db": ("REDIS_DB", int),
+    "max_connections": ("REDIS_MAX_CONNECTIONS", int),
+    "pubsub_max_connections": ("REDIS_PUBSUB_MAX_CONNECTIONS", int),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class RedisConfig:
+    host: str = "localhost"
+    port: int = 6379
+    db: int = 0
+    max_connections: int = 50
+    pubsub_max_connections: int = 50  # отдельный лимит для pub/sub-подписок
+    pool_timeout: float = 20  # сколько ждать свободного соединения из пула
+    socket_timeout: float = 5
+    health_check_interval: int = 30
+    retry_on_timeout: bool = True
+
+
+@dataclasses.dataclass
+class PoolMetrics:
+    in_use: int = 0
+    max_in_use: int = 0
+    acquired: int = 0
+    wait_time_total: float = 0.0  # только ожидание свободного места в пуле
+    wait_time_max: float = 0.0
+
+    @property
+    def wait_time_avg(self) -> float:
+        return self.wait_time_total / self.acquired if self.acquired else 0.0
+
+
+class PoolMetricsMixin:
+    """Считает занятые соединения и время ожидания свободного места в пуле.
+
+    Время подключения и health check в ожидание не входят.
+    """
+
+    def _init_metrics(self) -> None:
+        self.metrics = PoolMetrics()
+        self._metrics_lock = threading.Lock()
+
+    def _record_wait(self, waited: float) -> None:
+        with self._metrics_lock:
+            self.metrics.wait_time_total += waited
+            self.metrics.wait_time_max = max(self.metrics.wait_time_max, waited)
+
+    def _record_acquire(self) -> None:
+        with self._metrics_lock:
+            m = self.metrics
+            m.in_use += 1
+            m.max_in_use = max(m.max_in_use, m.in_use)
+            m.acquired += 1
+
+    def _record_release(self) -> None:
+        with self._metrics_lock:
+            self.metrics.in_use = max(self.metrics.in_use - 1, 0)
+
+
+class MeteredLifoQueue(queue.LifoQueue):
+    """Очередь свободных слотов ``BlockingConnectionPool``, замеряющая ожидание."""
+
+    on_wait = None
+
+    def get(self, block=True, timeout=None):
+        started = time.perf_counter()
+        item = super().get(block, timeout)
+        if self.on_wait is not None:
+            self.on_wait(time.perf_counter() - started)
+        return item
+
+
+class MeteredConnectionPool(PoolMetricsMixin, redis.BlockingConnectionPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, queue_class=MeteredLifoQueue, **kwargs)
+
+    def reset(self) -> None:
+        # Пул сбрасывается и после fork - вместе с ним обнуляем метрики
+        self._init_metrics()
+        super().reset()
+        self.pool.on_wait = self._record_wait
+
+    def get_connection(self, *args, **kwargs):
+        connection = super().get_connection(*args, **kwargs)
+        self._record_acquire()
+        return connection
+
+    def release(self, connection):
+        self._record_release()
+        super().release(connection)
+
+
+# Начало ожидания в текущей задаче: условие свободного места в пуле
+# проверяется в той же задаче, что и get_connection
+_wait_started: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "wait_started"
+)
+
+
+class AsyncMeteredConnectionPool(
+    PoolMetricsMixin, redis.asyncio.BlockingConnectionPool
+):
+    def __init__(self, *args, **kwargs):
+        self._init_metrics()
+        super().__init__(*args, **kwargs)
+
+    async def get_connection(self, *args, **kwargs):
+        _wait_started.set(time.perf_counter())
+        connection = await super().get_connection(*args, **kwargs)
+        self._record_acquire()
+        return connection
+
+    def can_get_connection(self) -> bool:
+        # Условие ожидания в get_connection: первый True - конец ожидания
+        available = super().can_get_connection()
+        started = _wait_started.get(None)
+        if available and started is not None:
+            self._record_wait(time.perf_counter() - started)
+            _wait_started.set(None)
+        return available
+
+    async def release(self, connection):
+        self._record_release()
+        await super().release(connection)
+
+
+_pools: dict[RedisConfig, MeteredConnectionPool] = {}
+_pubsub_pools: dict[RedisConfig, MeteredConnectionPool] = {}
+# Асинхронные пулы привязаны к event loop, поэтому держим по пулу на loop
+_async_pools: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[RedisConfig, AsyncMeteredConnectionPool]
+] = weakref.WeakKeyDictionary()
+_async_pubsub_pools: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[RedisConfig, AsyncMeteredConnectionPool]
+] = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def make_config(**overrides) -> RedisConfig:
+    """Конфигурация по умолчанию, переменные окружения, затем ``overrides``.
+
+    Окружение читается при каждом вызове, а не один раз при импорте.
+    """
+
+    fields = {
+        name: cast(os.environ[var])
+        for name, (var, cast) in ENV_VARS.items()
+        if var in os.environ
+    }
+    fields |= {name: value for name, value in overrides.items() if value is not None}
+    return RedisConfig(**fields)
+
+
+def _connection_kwargs(config: RedisConfig) -> dict:
+    return {
+        "host": config.host,
+        "port": config.port,
+        "db": config.db,
+        "socket_timeout": config.socket_timeout,
+        "health_check_interval": config.health_check_interval,
+        "retry_on_timeout": config.retry_on_timeout,
+    }
+
+
+def _sync_pool(pools: dict, config: RedisConfig, max_connections: int):
+    with _lock:
+        pool = pools.get(config)
+        if pool is None:
+            pool = pools[config] = MeteredConnectionPool(
+                max_connections=max_connections,
+                timeout=config.pool_timeout,
+                retry=Retry(ExponentialBackoff(), RETRY_ATTEMPTS),
+                **_connection_kwargs(config),
+            )
+        return pool
+
+
+def _async_pool(pools_by_loop, config: RedisConfig, max_connections: int):
+    loop = asyncio.get_running_loop()
+    with _lock:
+        pools = pools_by_loop.setdefault(loop, {})
+        pool = pools.get(config)
+        if pool is None:
+            pool = pools[config] = AsyncMeteredConnectionPool(
+                max_connections=max_connections,
+                timeout=config.pool_timeout,
+                retry=redis.asyncio.retry.Retry(ExponentialBackoff(), RETRY_ATTEMPTS),
+                **_connection_kwargs(config),
+            )
+        return pool
+
+
+def get_pool(config: RedisConfig | None = None) -> MeteredConnectionPool:
+    config = config or make_config()
+    return _sync_pool(_pools, config, config.max_connections)
+
+
+def get_async_pool(config: RedisConfig | None = None) -> AsyncMeteredConnectionPool:
+    config = config or make_config()
+    return _async_pool(_async_pools, config, config.max_connections)
+
+
+def get_client(**overrides) -> redis.Redis:
+    """Клиент на общем для процесса пуле соединений.
+
+    Параметры по умолчанию берутся из ``RedisConfig`` и переменных окружения
+    ``REDIS_HOST``, ``REDIS_PORT``, ``REDIS_DB``, ``REDIS_MAX_CONNECTIONS``;
+    ``overrides`` заменяют отдельные поля. Клиенты с одинаковой
+    конфигурацией делят один пул.
+    """
+
+    return redis.Redis(connection_pool=get_pool(make_config(**overrides)))
+
+
+def get_async_client(**overrides) -> redis.asyncio.Redis:
+    """То же, что ``get_client``, но для asyncio; пул общий в пределах event loop."""
+
+    return redis.asyncio.Redis(connection_pool=get_async_pool(make_config(**overrides)))
+
+
+def get_pubsub_client(**overrides) -> redis.Redis:
+    """Клиент для долгих pub/sub-подписок.
+
+    Подписка держит соединение все время ожидания, поэтому такие клиенты
+    работают на отдельном пуле и не отнимают соединения у обычных команд
+    из ``get_client``. Размер пула ограничен ``pubsub_max_connections``
+    (``REDIS_PUBSUB_MAX_CONNECTIONS``): лишние подписчики ждут свободного
+    соединения до ``pool_timeout``.
+    """
+
+    config = make_config(**overrides)
+    pool = _sync_pool(_pubsub_pools, config, config.pubsub_max_connections)
+    return redis.Redis(connection_pool=pool)
+
+
+def get_async_pubsub_client(**overrides) -> redis.asyncio.Redis:
+    """То же, что ``get_pubsub_client``, но для asyncio."""
+
+    config = make_config(**overrides)
+    pool = _async_pool(_async_pubsub_pools, config, config.pubsub_max_connections)
+    return redis.asyncio.Redis(connection_pool=pool)
+
+
+def pool_metrics() -> list[tuple[str, RedisConfig, PoolMetrics]]:
+    """Метрики всех общих пулов процесса: ``(kind, config, metrics)``.
+
+    ``kind`` - ``"sync"``, ``"async"``, ``"pubsub"`` или ``"async pubsub"``.
+    """
+
+    metrics = []
+    with _lock:
+        for kind, pools in (("sync", _pools), ("pubsub", _pubsub_pools)):
+            metrics += [(kind, config, pool.metrics) for config, pool in pools.items()]
+        for kind, pools_by_loop in (
+            ("async", _async_pools),
+            ("async pubsub", _async_pubsub_pools),
+        ):
+            for pools in list(pools_by_loop.values()):
+                metrics += [
+                    (kind, config, pool.metrics) for config, pool in pools.items()
+                ]
+    return metrics
+
+
+if __name__ == "__main__":
+    client = get_client()
+    client.ping()
+    print(pool_metrics())
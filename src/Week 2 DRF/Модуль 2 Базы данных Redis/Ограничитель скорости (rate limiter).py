@@ -1,59 +1,335 @@
+import dataclasses
 import random
+import threading
 import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping, Sequence
 
 import redis
+import redis.asyncio
+from redis_clients import get_async_client, get_client
+
+DEFAULT_KEY = "rate_limiter"
+DEFAULT_SCOPE = "*"
+LOCAL_CACHE_MAX_KEYS = 10_000
+
+# Скользящее окно по нескольким правилам сразу, атомарно на стороне Redis.
+# Время берется с сервера (TIME), чтобы рассинхрон часов клиентов не влиял на лимиты.
+# ARGV: cost, member, затем пары (window_ms, max_requests).
+# Возвращает {выданное число токенов, через сколько мс повторить}.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local cost = tonumber(ARGV[1])
+local member = ARGV[2]
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local max_window = 0
+for i = 3, #ARGV, 2 do
+    local window = tonumber(ARGV[i])
+    if window > max_window then
+        max_window = window
+    end
+end
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - max_window)
+
+local granted = cost
+local retry_after = 0
+for i = 3, #ARGV, 2 do
+    local window = tonumber(ARGV[i])
+    local limit = tonumber(ARGV[i + 1])
+    local count = redis.call('ZCOUNT', key, now - window, '+inf')
+    local free = limit - count
+    if free < granted then
+        granted = free
+    end
+    if free <= 0 then
+        -- Ждем, пока из окна не выпадет запись, освобождающая место
+        local oldest = redis.call(
+            'ZRANGEBYSCORE', key, now - window, '+inf',
+            'WITHSCORES', 'LIMIT', count - limit, 1
+        )
+        local wait = window
+        if oldest[2] then
+            wait = tonumber(oldest[2]) + window - now
+        end
+        if wait > retry_after then
+            retry_after = wait
+        end
+    end
+end
+
+if granted <= 0 then
+    return {0, retry_after}
+end
+
+for i = 1, granted do
+    redis.call('ZADD', key, now, member .. ':' .. i)
+end
+redis.call('PEXPIRE', key, max_window + 1000)
+
+return {granted, 0}
+"""
 
 
 class RateLimitExceed(Exception):
     pass
 
 
+@dataclasses.dataclass(frozen=True)
+class Rule:
+    max_requests: int
+    window_seconds: float
+
+
 class RateLimiter:
+    """Ограничитель скорости со скользящим окном в Redis.
+
+    Лимиты считаются отдельно для каждого клиента (пользователя, IP, токена).
+    Правила задаются списком (одни и те же для всех) или таблицей
+    ``{"scope": [Rule, ...]}``, где scope - префикс идентификатора до ``:``,
+    например ``"ip:10.0.0.1"``. Правило ``"*"`` используется по умолчанию;
+    если его нет в таблице, оно строится из ``max_requests``/``window_seconds``.
+
+    С ``local_cache=True`` решение "запрещено до T" кешируется в процессе,
+    а разрешения выдаются пачками по ``lease_size`` токенов, поэтому горячие
+    клиенты почти не ходят в Redis. Лимиты при этом соблюдаются приближенно:
+    взятые в аренду токены списываются в Redis сразу. Локальный кеш ограничен
+    ``LOCAL_CACHE_MAX_KEYS`` записями, давно не использованные вытесняются.
+    """
+
     def __init__(
-        self, max_requests=5, window_seconds=3, redis_host="localhost", redis_port=6379
+        self,
+        max_requests=5,
+        window_seconds=3,
+        redis_host=None,
+        redis_port=None,
+        *,
+        rules: Sequence[Rule] | Mapping[str, Sequence[Rule]] | None = None,
+        prefix=DEFAULT_KEY,
+        local_cache=False,
+        lease_size=1,
+        client: redis.Redis | None = None,
     ):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.redis = redis.Redis(host=redis_host, port=redis_port, db=0)
-        self.key = "rate_limiter"
+        self.redis = client or self._make_client(host=redis_host, port=redis_port)
+        self.key = prefix
+
+        if rules is None:
+            rules = [Rule(max_requests, window_seconds)]
+        if not isinstance(rules, Mapping):
+            rules = {DEFAULT_SCOPE: rules}
+        self.rules = {scope: tuple(scope_rules) for scope, scope_rules in rules.items()}
+        self.rules.setdefault(DEFAULT_SCOPE, (Rule(max_requests, window_seconds),))
+
+        self.local_cache = local_cache
+        self.lease_size = lease_size if local_cache else 1
+        # LRU: при переполнении вытесняются записи, которые дольше всех не трогали
+        self._denied_until: OrderedDict[str, float] = OrderedDict()
+        # ключ -> (остаток токенов, годен до)
+        self._leases: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._script = self.redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def _make_client(self, **overrides) -> redis.Redis:
+        return get_client(**overrides)
+
+    def test(self, identity: str | None = None) -> bool:
+        return self.test_many([identity])[0]
 
-    def test(self) -> bool:
-        now = time.time()
+    def test_many(self, identities: Iterable[str | None]) -> list[bool]:
+        identities = list(identities)
+        results = [False] * len(identities)
+        pending = list(range(len(identities)))
+        while pending:
+            batch, pending = self._test_many_local(identities, results, pending)
+            if not batch:
+                break
 
-        pipeline = self.redis.pipeline()
+            pipeline = self.redis.pipeline(transaction=False)
+            for i in batch:
+                key, args = self._script_args(identities[i])
+                self._script(keys=[key], args=args, client=pipeline)
+            replies = pipeline.execute()
 
-        pipeline.zremrangebyscore(self.key, "-inf", now - self.window_seconds)
+            self._apply_replies(identities, results, batch, replies)
+        return results
 
-        pipeline.zcard(self.key)
-        result = pipeline.execute()
+    def _test_many_local(
+        self, identities: list[str | None], results: list[bool], pending: list[int]
+    ) -> tuple[list[int], list[int]]:
+        # Сначала пробуем решить локально, в Redis идут только промахи.
+        # Повторы одного клиента в пачке откладываются до ответа на первый
+        # запрос: их обслуживает взятая им аренда.
+        batch, deferred = [], []
+        batch_keys = set()
+        for i in pending:
+            identity = identities[i]
+            allowed = self._test_local(identity)
+            if allowed is not None:
+                results[i] = allowed
+            elif not self.local_cache:
+                batch.append(i)
+            elif (key := self._redis_key(identity)) in batch_keys:
+                deferred.append(i)
+            else:
+                batch_keys.add(key)
+                batch.append(i)
+        return batch, deferred
 
-        current_count = result[1]
+    def _apply_replies(
+        self,
+        identities: list[str | None],
+        results: list[bool],
+        pending: list[int],
+        replies: list,
+    ) -> None:
+        for i, (granted, retry_after_ms) in zip(pending, replies):
+            results[i] = granted > 0
+            self._store_local(identities[i], int(granted), int(retry_after_ms))
 
-        if current_count >= self.max_requests:
-            return False
+    def _rules_for(self, identity: str | None) -> tuple[Rule, ...]:
+        if identity is not None:
+            scope = identity.split(":", 1)[0]
+            if scope in self.rules:
+                return self.rules[scope]
+        return self.rules[DEFAULT_SCOPE]
 
-        self.redis.zadd(self.key, {str(now): now})
-        self.redis.expire(self.key, self.window_seconds + 1)
+    def _redis_key(self, identity: str | None) -> str:
+        if identity is None:
+            return self.key
+        return f"{self.key}:{identity}"
 
-        return True
+    def _script_args(self, identity: str | None) -> tuple[str, list]:
+        args = [self.lease_size, uuid.uuid4().hex]
+        for rule in self._rules_for(identity):
+            args += [int(rule.window_seconds * 1000), rule.max_requests]
+        return self._redis_key(identity), args
 
+    def _test_local(self, identity: str | None) -> bool | None:
+        if not self.local_cache:
+            return None
 
-def make_api_request(rate_limiter: RateLimiter) -> None:
-    if not rate_limiter.test():
+        key = self._redis_key(identity)
+        now = time.monotonic()
+        with self._lock:
+            # Аренда уже учтена в Redis, поэтому тратится раньше проверки запрета
+            lease = self._leases.get(key)
+            if lease is not None:
+                tokens, valid_until = lease
+                if now < valid_until and tokens > 0:
+                    if tokens == 1:
+                        del self._leases[key]
+                    else:
+                        self._leases[key] = (tokens - 1, valid_until)
+                        self._leases.move_to_end(key)
+                    return True
+                del self._leases[key]
+
+            denied_until = self._denied_until.get(key)
+            if denied_until is not None:
+                if now < denied_until:
+                    return False
+                del self._denied_until[key]
+
+        return None
+
+    def _store_local(self, identity: str | None, granted: int, retry_after_ms: int):
+        if not self.local_cache:
+            return
+
+        key = self._redis_key(identity)
+        now = time.monotonic()
+        with self._lock:
+            tokens, valid_until = self._leases.get(key, (0, 0))
+            if tokens and now >= valid_until:
+                tokens = 0
+
+            if granted == 0:
+                # Пока жива аренда, запрет не кешируем - иначе она пропадет
+                if not tokens:
+                    deny_until = now + retry_after_ms / 1000
+                    self._put_local(self._denied_until, key, deny_until)
+                return
+
+            if granted > 1:
+                # Токены годны, пока учтены в самом коротком окне. При слиянии
+                # с прежней арендой оставляем ее срок: он наступает раньше
+                window = min(rule.window_seconds for rule in self._rules_for(identity))
+                expires = min(valid_until, now + window) if tokens else now + window
+                self._put_local(self._leases, key, (tokens + granted - 1, expires))
+
+    @staticmethod
+    def _put_local(cache: OrderedDict, key: str, value) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > LOCAL_CACHE_MAX_KEYS:
+            cache.popitem(last=False)
+
+
+class AsyncRateLimiter(RateLimiter):
+    """Вариант ``RateLimiter`` для asyncio поверх ``redis.asyncio``.
+
+    Создавать нужно внутри работающего event loop.
+    """
+
+    def _make_client(self, **overrides) -> redis.asyncio.Redis:
+        return get_async_client(**overrides)
+
+    async def test(self, identity: str | None = None) -> bool:
+        return (await self.test_many([identity]))[0]
+
+    async def test_many(self, identities: Iterable[str | None]) -> list[bool]:
+        identities = list(identities)
+        results = [False] * len(identities)
+        pending = list(range(len(identities)))
+        while pending:
+            batch, pending = self._test_many_local(identities, results, pending)
+            if not batch:
+                break
+
+            pipeline = self.redis.pipeline(transaction=False)
+            for i in batch:
+                key, args = self._script_args(identities[i])
+                await self._script(keys=[key], args=args, client=pipeline)
+            replies = await pipeline.execute()
+
+            self._apply_replies(identities, results, batch, replies)
+        return results
+
+
+def make_api_request(rate_limiter: RateLimiter, client: str | None = None) -> None:
+    if not rate_limiter.test(client):
         raise RateLimitExceed
     else:
         print("Request allowed")
 
 
 if __name__ == "__main__":
-    rate_limiter = RateLimiter()
+    rate_limiter = RateLimiter(
+        rules={
+            "*": [Rule(5, 3)],
+            "user": [Rule(5, 3), Rule(20, 60)],
+        },
+        local_cache=True,
+        lease_size=2,
+    )
+
+    clients = ["user:alice", "user:bob", "ip:10.0.0.1"]
 
     for _ in range(50):
         time.sleep(random.randint(1, 2))
 
         try:
-            make_api_request(rate_limiter)
+            make_api_request(rate_limiter, random.choice(clients))
         except RateLimitExceed:
             print("Rate limit exceed!")
         else:
             print("All good")
+
+    print(rate_limiter.test_many(clients))
@@ -1,12 +1,15 @@
+import asyncio
 import json
 
 import redis
+import redis.asyncio
+from redis_clients import get_async_client, get_client
 
 
 class RedisQueue:
-    def __init__(self, name="queue"):
+    def __init__(self, name="queue", client: redis.Redis | None = None):
         self.name = name
-        self.redis = redis.Redis(host="localhost", port=6379, db=0)
+        self.redis = client or get_client()
 
     def publish(self, msg: dict) -> None:
         self.redis.rpush(self.name, json.dumps(msg))
@@ -18,6 +21,30 @@ class RedisQueue:
         return json.loads(msg)
 
 
+class AsyncRedisQueue:
+    def __init__(self, name="queue", client: redis.asyncio.Redis | None = None):
+        self.name = name
+        self.redis = client or get_async_client()
+
+    async def publish(self, msg: dict) -> None:
+        await self.redis.rpush(self.name, json.dumps(msg))
+
+    async def consume(self) -> dict | None:
+        msg = await self.redis.lpop(self.name)
+        if msg is None:
+            return None
+        return json.loads(msg)
+
+
+async def main() -> None:
+    q = AsyncRedisQueue()
+    await q.publish({"a": 1})
+    await q.publish({"b": 2})
+
+    assert await q.consume() == {"a": 1}
+    assert await q.consume() == {"b": 2}
+
+
 if __name__ == "__main__":
     q = RedisQueue()
     q.publish({"a": 1})
@@ -27,3 +54,5 @@ if __name__ == "__main__":
     assert q.consume() == {"a": 1}
     assert q.consume() == {"b": 2}
     assert q.consume() == {"c": 3}
+
+    asyncio.run(main())
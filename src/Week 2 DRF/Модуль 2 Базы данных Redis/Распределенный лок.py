@@ -1,34 +1,505 @@
+import asyncio
 import datetime
 import functools
+import inspect
+import json
+import random
+import threading
 import time
 import uuid
+from collections.abc import Sequence
 
 import redis
+import redis.asyncio
+from redis_clients import (
+    get_async_client,
+    get_async_pubsub_client,
+    get_client,
+    get_pubsub_client,
+)
 
-redis_client = redis.Redis(host="localhost", port=6379, db=0)
+RETRY_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+RESULT_TTL = datetime.timedelta(seconds=10)
 
+# Удаляем/продлеваем лок, только если он все еще наш
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+EXTEND_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+# Клиент и скрипты создаются при первом использовании, а не при импорте
+@functools.cache
+def get_redis_client() -> redis.Redis:
+    return get_client()
+
+
+@functools.cache
+def get_script(lua: str):
+    return get_redis_client().register_script(lua)
+
+
+class SingleFlightError(Exception):
+    """Ошибка, с которой завершился владелец лока в другом процессе."""
+
+
+class LockWatchdog(threading.Thread):
+    """Продлевает лок, пока выполняется функция.
+
+    Продление делается каждую треть TTL, поэтому лок не истечет,
+    даже если функция работает дольше ``max_processing_time``.
+    """
+
+    def __init__(self, lock_key: str, lock_value: str, ttl_ms: int):
+        super().__init__(daemon=True)
+        self.lock_key = lock_key
+        self.lock_value = lock_value
+        self.ttl_ms = ttl_ms
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.ttl_ms / 3000):
+            extended = get_script(EXTEND_LUA)(
+                keys=[self.lock_key], args=[self.lock_value, self.ttl_ms]
+            )
+            if not extended:
+                print(f"[LOCK LOST] {self.lock_key} больше не принадлежит нам.")
+                return
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+def make_lock_key_builder(func, key_args: Sequence[str]):
+    """Строит функцию ключа лока; сигнатура разбирается один раз при декорировании."""
+
+    lock_key = f"lock: {func.__name__}"
+    if not key_args:
+        return lambda args, kwargs: lock_key
+
+    signature = inspect.signature(func)
+    unknown = [name for name in key_args if name not in signature.parameters]
+    if unknown:
+        raise ValueError(f"{func.__name__}() не имеет аргументов {unknown}")
+
+    def build(args, kwargs) -> str:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        parts = [f"{name}={bound.arguments[name]}" for name in key_args]
+        return f"{lock_key}:{':'.join(parts)}"
+
+    return build
+
+
+def keyspace_channel(
+    lock_key: str, client: redis.Redis | redis.asyncio.Redis | None = None
+) -> str:
+    client = client or get_redis_client()
+    db = client.connection_pool.connection_kwargs.get("db", 0)
+    return f"__keyspace@{db}__:{lock_key}"
+
+
+def retry_delay(attempt: int) -> float:
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_DELAY * 2**attempt))
+
+
+def acquire(lock_key: str, lock_value: str, ttl_ms: int, timeout: float | None) -> bool:
+    redis_client = get_redis_client()
+
+    if redis_client.set(lock_key, lock_value, nx=True, px=ttl_ms):
+        return True
+    if timeout is None:
+        return False
+
+    # Ждем освобождения лока: просыпаемся по keyspace-уведомлению об удалении
+    # или истечении ключа (нужно notify-keyspace-events "Kgx" на сервере),
+    # а если уведомления выключены - по таймауту с джиттером.
+    deadline = time.monotonic() + timeout
+    attempt = 0
+
+    with get_pubsub_client().pubsub(ignore_subscribe_messages=True) as pubsub:
+        pubsub.subscribe(keyspace_channel(lock_key))
+
+        while True:
+            if redis_client.set(lock_key, lock_value, nx=True, px=ttl_ms):
+                return True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+
+            pubsub.get_message(timeout=min(retry_delay(attempt), remaining))
+            attempt += 1
+
+
+def result_key(lock_key: str, lock_value: str | bytes) -> str:
+    if isinstance(lock_value, bytes):
+        lock_value = lock_value.decode()
+    return f"{lock_key}:result:{lock_value}"
+
+
+def result_channel(lock_key: str) -> str:
+    return f"{lock_key}:result"
+
+
+def result_from_message(message: dict | None, lock_key: str) -> bytes | None:
+    if message is not None and message["channel"] == result_channel(lock_key).encode():
+        return message["data"]
+    return None
+
+
+def acquire_or_wait_result(
+    lock_key: str, lock_value: str, ttl_ms: int, timeout: float | None
+) -> tuple[bool, bytes | None]:
+    """Берет лок или дожидается результата текущего владельца.
+
+    Возвращает ``(True, None)``, если лок взят, ``(False, payload)``, если
+    владелец опубликовал результат, и ``(False, None)`` по таймауту.
+    Без ``timeout`` ждем, пока владелец держит лок.
+    """
+
+    redis_client = get_redis_client()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    holder = None
+    attempt = 0
+
+    with get_pubsub_client().pubsub(ignore_subscribe_messages=True) as pubsub:
+        # Подписываемся до проверок, чтобы не пропустить публикацию
+        pubsub.subscribe(result_channel(lock_key), keyspace_channel(lock_key))
+
+        while True:
+            # Владелец мог опубликовать результат и отпустить лок, пока мы
+            # не слушали: сначала разбираем уже пришедшие сообщения и результат
+            # последнего известного владельца, и только потом берем лок
+            while (message := pubsub.get_message(timeout=0)) is not None:
+                if (payload := result_from_message(message, lock_key)) is not None:
+                    return False, payload
+            if holder is not None:
+                payload = redis_client.get(result_key(lock_key, holder))
+                if payload is not None:
+                    return False, payload
+
+            if redis_client.set(lock_key, lock_value, nx=True, px=ttl_ms):
+                # Результат мог появиться между проверкой и SET NX
+                if holder is not None:
+                    payload = redis_client.get(result_key(lock_key, holder))
+                    if payload is not None:
+                        release(lock_key, lock_value)
+                        return False, payload
+                return True, None
+
+            # Результат мог появиться до подписки - ищем его по токену владельца
+            holder = redis_client.get(lock_key) or holder
+            if holder is not None:
+                payload = redis_client.get(result_key(lock_key, holder))
+                if payload is not None:
+                    return False, payload
+
+            delay = retry_delay(attempt)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, None
+                delay = min(delay, remaining)
+
+            message = pubsub.get_message(timeout=delay)
+            if (payload := result_from_message(message, lock_key)) is not None:
+                return False, payload
+            attempt += 1
+
+
+def dump_result(data: dict) -> str:
+    try:
+        return json.dumps(data)
+    except TypeError as e:
+        return json.dumps({"error": type(e).__name__, "message": str(e)})
+
+
+def publish_result(
+    lock_key: str, lock_value: str, result_ttl_ms: int, data: dict
+) -> None:
+    redis_client = get_redis_client()
+    payload = dump_result(data)
+    pipeline = redis_client.pipeline()
+    pipeline.set(result_key(lock_key, lock_value), payload, px=result_ttl_ms)
+    pipeline.publish(result_channel(lock_key), payload)
+    pipeline.execute()
+
+
+def load_result(payload: bytes):
+    data = json.loads(payload)
+    if "error" in data:
+        raise SingleFlightError(f"{data['error']}: {data['message']}")
+    return data["result"]
+
+
+def release(lock_key: str, lock_value: str) -> bool:
+    return bool(get_script(RELEASE_LUA)(keys=[lock_key], args=[lock_value]))
+
+
+def single(
+    max_processing_time: datetime.timedelta,
+    *,
+    timeout: datetime.timedelta | None = None,
+    key_args: Sequence[str] = (),
+    share_result: bool = False,
+    result_ttl: datetime.timedelta = RESULT_TTL,
+):
+    """Выполняет функцию не более чем в одном экземпляре на весь кластер.
+
+    ``max_processing_time`` - TTL лока, он продлевается, пока функция работает.
+    Если задан ``timeout``, ждем освобождения лока не дольше этого времени,
+    иначе сразу возвращаем ``None``. ``key_args`` - имена аргументов,
+    значения которых входят в ключ лока.
+
+    С ``share_result=True`` владелец лока публикует результат (или ошибку)
+    в Redis на ``result_ttl``, а остальные вызовы в любом процессе ждут его
+    и возвращают вместо повторного вычисления. Результат должен
+    сериализоваться в JSON, ошибка владельца у ожидающих поднимается
+    как ``SingleFlightError``.
+
+    Ожидающие держат подписку на соединении из отдельного pub/sub-пула
+    без лимита, а из общего пула берут соединение только на время одной
+    команды, поэтому даже много ожидающих не блокируют продление,
+    публикацию результата и освобождение лока владельцем.
+    """
+
+    ttl_ms = int(max_processing_time.total_seconds() * 1000)
+    timeout_seconds = timeout.total_seconds() if timeout is not None else None
+    result_ttl_ms = int(result_ttl.total_seconds() * 1000)
 
-def single(max_processing_time: datetime.timedelta):
     def decorator(func):
+        make_lock_key = make_lock_key_builder(func, key_args)
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            lock_key = f"lock: {func.__name__}"
+            lock_key = make_lock_key(args, kwargs)
             lock_value = str(uuid.uuid4())
-            lock_ttl = int(max_processing_time.total_seconds())
 
-            acquired = redis_client.set(lock_key, lock_value, nx=True, ex=lock_ttl)
+            if share_result:
+                acquired, payload = acquire_or_wait_result(
+                    lock_key, lock_value, ttl_ms, timeout_seconds
+                )
+                if payload is not None:
+                    print(f"[SHARED RESULT] {func.__name__} выполнен другим вызовом.")
+                    return load_result(payload)
+            else:
+                acquired = acquire(lock_key, lock_value, ttl_ms, timeout_seconds)
 
             if not acquired:
                 print(f"[LOCKED] {func.__name__} уже выполняется.")
                 return None
 
+            watchdog = LockWatchdog(lock_key, lock_value, ttl_ms)
+            watchdog.start()
             try:
                 print(f"[LOCK ACQUIRED] Выполняем {func.__name__}.")
-                return func(*args, **kwargs)
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    if share_result:
+                        error = {"error": type(e).__name__, "message": str(e)}
+                        publish_result(lock_key, lock_value, result_ttl_ms, error)
+                    raise
+                if share_result:
+                    publish_result(
+                        lock_key, lock_value, result_ttl_ms, {"result": result}
+                    )
+                return result
             finally:
-                val = redis_client.get(lock_key)
-                if val and val.decode() == lock_value:
-                    redis_client.delete(lock_key)
+                watchdog.stop()
+                if release(lock_key, lock_value):
+                    print(f"[LOCK RELEASED] {func.__name__}.")
+
+        return wrapper
+
+    return decorator
+
+
+async def async_acquire(
+    client: redis.asyncio.Redis,
+    lock_key: str,
+    lock_value: str,
+    ttl_ms: int,
+    timeout: float | None,
+) -> bool:
+    if await client.set(lock_key, lock_value, nx=True, px=ttl_ms):
+        return True
+    if timeout is None:
+        return False
+
+    deadline = time.monotonic() + timeout
+    attempt = 0
+
+    async with get_async_pubsub_client().pubsub(
+        ignore_subscribe_messages=True
+    ) as pubsub:
+        await pubsub.subscribe(keyspace_channel(lock_key, client))
+
+        while True:
+            if await client.set(lock_key, lock_value, nx=True, px=ttl_ms):
+                return True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+
+            await pubsub.get_message(timeout=min(retry_delay(attempt), remaining))
+            attempt += 1
+
+
+async def async_acquire_or_wait_result(
+    client: redis.asyncio.Redis,
+    lock_key: str,
+    lock_value: str,
+    ttl_ms: int,
+    timeout: float | None,
+) -> tuple[bool, bytes | None]:
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    holder = None
+    attempt = 0
+
+    async with get_async_pubsub_client().pubsub(
+        ignore_subscribe_messages=True
+    ) as pubsub:
+        await pubsub.subscribe(
+            result_channel(lock_key), keyspace_channel(lock_key, client)
+        )
+
+        while True:
+            while (message := await pubsub.get_message(timeout=0)) is not None:
+                if (payload := result_from_message(message, lock_key)) is not None:
+                    return False, payload
+            if holder is not None:
+                payload = await client.get(result_key(lock_key, holder))
+                if payload is not None:
+                    return False, payload
+
+            if await client.set(lock_key, lock_value, nx=True, px=ttl_ms):
+                if holder is not None:
+                    payload = await client.get(result_key(lock_key, holder))
+                    if payload is not None:
+                        release_script = client.register_script(RELEASE_LUA)
+                        await release_script(keys=[lock_key], args=[lock_value])
+                        return False, payload
+                return True, None
+
+            holder = await client.get(lock_key) or holder
+            if holder is not None:
+                payload = await client.get(result_key(lock_key, holder))
+                if payload is not None:
+                    return False, payload
+
+            delay = retry_delay(attempt)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, None
+                delay = min(delay, remaining)
+
+            message = await pubsub.get_message(timeout=delay)
+            if (payload := result_from_message(message, lock_key)) is not None:
+                return False, payload
+            attempt += 1
+
+
+async def async_publish_result(
+    client: redis.asyncio.Redis,
+    lock_key: str,
+    lock_value: str,
+    result_ttl_ms: int,
+    data: dict,
+) -> None:
+    payload = dump_result(data)
+    pipeline = client.pipeline()
+    pipeline.set(result_key(lock_key, lock_value), payload, px=result_ttl_ms)
+    pipeline.publish(result_channel(lock_key), payload)
+    await pipeline.execute()
+
+
+async def async_watchdog(
+    client: redis.asyncio.Redis, lock_key: str, lock_value: str, ttl_ms: int
+) -> None:
+    extend = client.register_script(EXTEND_LUA)
+    while True:
+        await asyncio.sleep(ttl_ms / 3000)
+        if not await extend(keys=[lock_key], args=[lock_value, ttl_ms]):
+            print(f"[LOCK LOST] {lock_key} больше не принадлежит нам.")
+            return
+
+
+def single_async(
+    max_processing_time: datetime.timedelta,
+    *,
+    timeout: datetime.timedelta | None = None,
+    key_args: Sequence[str] = (),
+    share_result: bool = False,
+    result_ttl: datetime.timedelta = RESULT_TTL,
+):
+    """То же, что ``single``, но для корутин; работает через ``redis.asyncio``."""
+
+    ttl_ms = int(max_processing_time.total_seconds() * 1000)
+    timeout_seconds = timeout.total_seconds() if timeout is not None else None
+    result_ttl_ms = int(result_ttl.total_seconds() * 1000)
+
+    def decorator(func):
+        make_lock_key = make_lock_key_builder(func, key_args)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            client = get_async_client()
+            lock_key = make_lock_key(args, kwargs)
+            lock_value = str(uuid.uuid4())
+
+            if share_result:
+                acquired, payload = await async_acquire_or_wait_result(
+                    client, lock_key, lock_value, ttl_ms, timeout_seconds
+                )
+                if payload is not None:
+                    print(f"[SHARED RESULT] {func.__name__} выполнен другим вызовом.")
+                    return load_result(payload)
+            else:
+                acquired = await async_acquire(
+                    client, lock_key, lock_value, ttl_ms, timeout_seconds
+                )
+
+            if not acquired:
+                print(f"[LOCKED] {func.__name__} уже выполняется.")
+                return None
+
+            watchdog = asyncio.create_task(
+                async_watchdog(client, lock_key, lock_value, ttl_ms)
+            )
+            try:
+                print(f"[LOCK ACQUIRED] Выполняем {func.__name__}.")
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    if share_result:
+                        error = {"error": type(e).__name__, "message": str(e)}
+                        await async_publish_result(
+                            client, lock_key, lock_value, result_ttl_ms, error
+                        )
+                    raise
+                if share_result:
+                    await async_publish_result(
+                        client, lock_key, lock_value, result_ttl_ms, {"result": result}
+                    )
+                return result
+            finally:
+                watchdog.cancel()
+                release_script = client.register_script(RELEASE_LUA)
+                if await release_script(keys=[lock_key], args=[lock_value]):
                     print(f"[LOCK RELEASED] {func.__name__}.")
 
         return wrapper
@@ -43,5 +514,65 @@ def process_transaction():
     print("Транзакция завершена.")
 
 
+@single(
+    max_processing_time=datetime.timedelta(seconds=2),
+    timeout=datetime.timedelta(seconds=10),
+    key_args=["account_id"],
+)
+def process_account(account_id: int, amount: int):
+    print(f"Списание {amount} со счета {account_id}.")
+    time.sleep(3)  # дольше TTL: лок продлевает watchdog
+
+
+@single(
+    max_processing_time=datetime.timedelta(seconds=5),
+    key_args=["currency"],
+    share_result=True,
+)
+def fetch_exchange_rate(currency: str) -> float:
+    print(f"Запрашиваем курс {currency}.")
+    time.sleep(2)
+    return random.uniform(80, 100)
+
+
+@single_async(
+    max_processing_time=datetime.timedelta(seconds=5),
+    key_args=["currency"],
+    share_result=True,
+)
+async def fetch_exchange_rate_async(currency: str) -> float:
+    print(f"Запрашиваем курс {currency}.")
+    await asyncio.sleep(2)
+    return random.uniform(80, 100)
+
+
+async def main() -> None:
+    rates = await asyncio.gather(*(fetch_exchange_rate_async("EUR") for _ in range(3)))
+    print(rates)
+
+
 if __name__ == "__main__":
     process_transaction()
+
+    threads = [
+        threading.Thread(target=process_account, args=(account_id, 100))
+        for account_id in (1, 1, 2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rates = []
+    threads = [
+        threading.Thread(target=lambda: rates.append(fetch_exchange_rate("USD")))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(rates)  # одно вычисление, три одинаковых результата
+
+    asyncio.run(main())
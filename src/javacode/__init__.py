@@ -0,0 +1,66 @@
+"""Учебные модули курса как импортируемый пакет.
+
+Файлы курса лежат в каталогах с пробелами и кириллицей, поэтому напрямую
+их не импортировать. Пакет отображает их на подмодули::
+
+    from javacode import rate_limiter
+    import javacode.singleton
+
+Модуль загружается только при первом импорте. Соседние модули, которые
+учебные файлы импортируют по имени (``singleton_module``, ``redis_clients``),
+находятся тем же способом, так что ``sys.path`` настраивать не нужно.
+Сам пакет ставится вместе с проектом: ``uv sync`` или ``pip install -e .``.
+"""
+
+import importlib.abc
+import importlib.util
+import sys
+from pathlib import Path
+
+PACKAGE = Path(__file__).resolve().parent
+# В установленном колесе файлы курса лежат в javacode/course, в репозитории
+# (и при editable-установке) - рядом с пакетом в src
+SRC = PACKAGE / "course" if (PACKAGE / "course").is_dir() else PACKAGE.parent
+
+MODULES = {
+    "class_attributes": "Week 1/Модуль 1/Атрибуты класса.py",
+    "lru_cache": "Week 1/Модуль 1/Декоратор кеширования.py",
+    "singleton": "Week 1/Модуль 1/Синглтон.py",
+    "sorted_search": "Week 1/Модуль 2/Поиск элемента в упорядоченном списке.py",
+    "async_http": "Week 1/Модуль 3/Асинхронный HTTP-запрос.py",
+    "async_http_advanced": (
+        "Week 1/Модуль 3/Асинхронный HTTP-запрос. Продвинутая реализация.py"
+    ),
+    "parallel_processing": "Week 1/Модуль 4/Параллельная обработка числовых данных.py",
+    "asgi_proxy": "Week 1/Модуль 6/ASGI функция которая проксирует курс валют.py",
+    "wsgi_proxy": "Week 1/Модуль 6/WSGI функция которая проксирует курс валют.py",
+    "rate_limiter": (
+        "Week 2 DRF/Модуль 2 Базы данных Redis/Ограничитель скорости (rate limiter).py"
+    ),
+    "redis_queue": "Week 2 DRF/Модуль 2 Базы данных Redis/Очередь.py",
+    "distributed_lock": "Week 2 DRF/Модуль 2 Базы данных Redis/Распределенный лок.py",
+}
+
+# Вспомогательные модули импортируются учебными файлами как модули верхнего уровня
+HELPERS = {
+    "singleton_module": "Week 1/Модуль 1/singleton_module.py",
+    "redis_clients": "Week 2 DRF/Модуль 2 Базы данных Redis/redis_clients.py",
+}
+
+
+class CourseFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        package, _, name = fullname.rpartition(".")
+        if package == __name__ and name in MODULES:
+            location = MODULES[name]
+        elif not package and name in HELPERS:
+            location = HELPERS[name]
+        else:
+            return None
+        return importlib.util.spec_from_file_location(fullname, SRC / location)
+
+
+# В конец meta_path: если каталог модуля уже в sys.path (запуск как скрипта),
+# обычный поиск находит его первым
+if not any(isinstance(finder, CourseFinder) for finder in sys.meta_path):
+    sys.meta_path.append(CourseFinder())
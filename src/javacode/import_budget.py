@@ -0,0 +1,113 @@
+"""Бюджет времени импорта модулей курса.
+
+Каждый модуль импортируется в отдельном чистом интерпретаторе: берем
+кумулятивное время из ``-X importtime`` и холодный старт - время процесса
+``python -c "import javacode.<module>"`` за вычетом пустого запуска.
+Оба числа - медиана из нескольких прогонов, пустой запуск замеряется один
+раз на все модули. Если хоть один модуль выходит за бюджет, скрипт
+завершается с кодом 1. Пакет должен быть установлен (``uv sync``)::
+
+    uv run python -m javacode.import_budget
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+
+from javacode import MODULES
+
+RUNS = 5
+
+# Бюджеты в мс, примерно вдвое выше худших замеров, чтобы проверка падала
+# на регрессиях, а не на шуме. Модули на Redis/aiohttp/httpx платят за импорт
+# библиотек, прокси - за urllib/ssl, параллельная обработка - за
+# multiprocessing; остальные импортируются почти мгновенно.
+DEFAULT_BUDGET_MS = 50
+BUDGETS_MS = {
+    "async_http": 600,
+    "async_http_advanced": 600,
+    "parallel_processing": 150,
+    "asgi_proxy": 300,
+    "wsgi_proxy": 150,
+    "rate_limiter": 500,
+    "redis_queue": 500,
+    "distributed_lock": 500,
+}
+
+
+def run(code: str, *options: str) -> tuple[float, str]:
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return (time.perf_counter() - started) * 1000, process.stderr
+
+
+def import_time_ms(module: str) -> tuple[float, list[tuple[float, str]]]:
+    """Медиана кумулятивного времени импорта и самые медленные импорты в ней."""
+
+    samples = sorted(import_time_sample(module) for _ in range(RUNS))
+    return samples[len(samples) // 2]
+
+
+def import_time_sample(module: str) -> tuple[float, list[tuple[float, str]]]:
+    _, stderr = run(f"import {module}", "-X", "importtime")
+    total = 0.0
+    slowest = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.removeprefix("import time:").split("|")
+        self_us, cumulative_us, name = (part.strip() for part in parts)
+        if not self_us.isdigit():
+            continue  # заголовок таблицы
+        slowest.append((int(self_us) / 1000, name))
+        if name == module:
+            total = int(cumulative_us) / 1000
+    slowest.sort(reverse=True)
+    return total, slowest[:3]
+
+
+def baseline_ms() -> float:
+    """Медиана запуска пустого интерпретатора."""
+
+    return statistics.median(run("pass")[0] for _ in range(RUNS))
+
+
+def cold_start_ms(module: str, baseline: float) -> float:
+    started = statistics.median(run(f"import {module}")[0] for _ in range(RUNS))
+    return max(started - baseline, 0.0)
+
+
+def main() -> int:
+    failed = []
+    baseline = baseline_ms()
+    for name in MODULES:
+        module = f"javacode.{name}"
+        budget = BUDGETS_MS.get(name, DEFAULT_BUDGET_MS)
+        imported, slowest = import_time_ms(module)
+        cold_start = cold_start_ms(module, baseline)
+
+        ok = imported <= budget and cold_start <= budget
+        status = "OK" if ok else "OVER"
+        print(
+            f"{status:>4} {name:<20} import {imported:7.1f} ms  "
+            f"cold start {cold_start:7.1f} ms  budget {budget} ms"
+        )
+        if not ok:
+            failed.append(name)
+            for self_ms, slow in slowest:
+                print(f"{'':>9}{slow}: {self_ms:.1f} ms")
+
+    if failed:
+        print(f"Превышен бюджет импорта: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())